@@ -1,13 +1,43 @@
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank
+)
+from django.db.models import Count, Exists, F, OuterRef
 from django_filters import rest_framework as filters
 
-from recipes.models import Ingredient, Recipe
+from recipes.counters import count_subquery
+from recipes.models import SEARCH_CONFIG, IngredientRecipe, Recipe
+from recipes.tags import get_tag_map, tag_choices
+
+TAGS_MODES = (
+    ('any', 'any'),
+    ('all', 'all'),
+)
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
-    is_favorited = filters.Filter(method='is_favorited_method')
-    is_in_shopping_cart = filters.Filter(method='is_in_shopping_cart_method')
+    is_favorited = filters.BooleanFilter(method='user_flag_method')
+    is_in_shopping_cart = filters.BooleanFilter(method='user_flag_method')
     author = filters.Filter(field_name='author__id')
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='tags_method',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES,
+        method='tags_mode_method',
+    )
+    search = filters.CharFilter(method='search_method')
+    has_ingredients = NumberInFilter(method='has_ingredients_method')
+    exclude_ingredients = NumberInFilter(
+        method='exclude_ingredients_method'
+    )
+    max_missing = filters.NumberFilter(method='max_missing_method')
 
     class Meta:
         model = Recipe
@@ -16,24 +46,74 @@ class RecipeFilter(filters.FilterSet):
             'is_in_shopping_cart',
             'author',
             'tags',
+            'tags_mode',
+            'search',
+            'has_ingredients',
+            'exclude_ingredients',
+            'max_missing',
         ]
 
-    def is_favorited_method(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.filter(recipes_favorite_recipe__user=user)
+    def user_flag_method(self, queryset, name, value):
+        # Фильтр по той же аннотации Exists, что выводит сериализатор.
+        if name not in queryset.query.annotations:
+            queryset = queryset.with_user_flags(self.request.user)
+        return queryset.filter(**{name: value})
+
+    def tags_method(self, queryset, name, value):
+        # Подзапрос по recipe_tags вместо JOIN: рецепт не дублируется,
+        # и не нужен DISTINCT по всей выборке.
+        tag_map = get_tag_map()
+        ids = {tag_map[slug] for slug in value if slug in tag_map}
+        recipes = Recipe.tags.through.objects.filter(tag_id__in=ids)
+        if self.form.cleaned_data.get('tags_mode') == 'all':
+            recipes = recipes.values('recipe_id').annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(ids))
+        return queryset.filter(pk__in=recipes.values('recipe_id'))
+
+    def tags_mode_method(self, queryset, name, value):
+        # Учитывается в tags_method.
         return queryset
 
-    def is_in_shopping_cart_method(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            queryset = queryset.filter(recipes_listshopping_recipe__user=user)
+    def search_method(self, queryset, name, value):
+        query = SearchQuery(value, config=SEARCH_CONFIG,
+                            search_type='websearch')
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by('-rank', '-id')
+        if self.request.query_params.get('highlight') in ('1', 'true'):
+            queryset = queryset.annotate(search_headline=SearchHeadline(
+                'text', query, config=SEARCH_CONFIG,
+                start_sel='<mark>', stop_sel='</mark>',
+            ))
         return queryset
 
+    def has_ingredients_method(self, queryset, name, value):
+        # Сначала рецепты, где больше нужных ингредиентов и меньше
+        # недостающих; кандидаты отбираются по индексу ингредиента.
+        ids = [int(pk) for pk in value]
+        return queryset.filter(
+            pk__in=IngredientRecipe.objects.filter(
+                ingredient_id__in=ids
+            ).values('recipe_id')
+        ).annotate(
+            matched=count_subquery(
+                IngredientRecipe, 'recipe', ingredient_id__in=ids
+            ),
+            missing=count_subquery(
+                IngredientRecipe, 'recipe', exclude={'ingredient_id__in': ids}
+            ),
+        ).order_by('-matched', 'missing', '-id')
 
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(lookup_expr='istartswith')
+    def exclude_ingredients_method(self, queryset, name, value):
+        return queryset.filter(~Exists(IngredientRecipe.objects.filter(
+            recipe=OuterRef('pk'),
+            ingredient_id__in=[int(pk) for pk in value],
+        )))
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+    def max_missing_method(self, queryset, name, value):
+        if 'missing' not in queryset.query.annotations:
+            queryset = queryset.annotate(
+                missing=count_subquery(IngredientRecipe, 'recipe')
+            )
+        return queryset.filter(missing__lte=value)
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import re
+from hashlib import md5
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from foodgram.routers import choose_replica, read_database
+
+logger = logging.getLogger(__name__)
+
+# Значения вне плейсхолдеров и списки IN (%s, %s, ...) не должны
+# различать запросы с одинаковой формой.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+IN_LISTS = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def fingerprint(sql):
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+current_profile = ContextVar('current_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = Counter()
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.queries.items() if count > 1}
+
+
+serializer_data = BaseSerializer.data
+
+
+def profiled_serializer_data(serializer):
+    # Время .data внешнего сериализатора без SQL: вложенные сериализаторы
+    # и ленивые запросы prefetch выполняются внутри него.
+    profile = current_profile.get()
+    if profile is None or profile.serializing:
+        return serializer_data.fget(serializer)
+    profile.serializing = True
+    started, db_time = time.perf_counter(), profile.db_time
+    try:
+        return serializer_data.fget(serializer)
+    finally:
+        profile.serializing = False
+        profile.serializer_time += (time.perf_counter() - started
+                                    - (profile.db_time - db_time))
+
+
+class ViewStats:
+    # Сводка по view внутри процесса для /api/_diagnostics/:
+    # у каждого воркера своя, в ответе — pid воркера.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = defaultdict(lambda: defaultdict(float))
+        self.duplicates = defaultdict(Counter)
+
+    def add(self, view, record):
+        with self.lock:
+            stats = self.views[view]
+            stats['requests'] += 1
+            stats['max_total_ms'] = max(stats['max_total_ms'],
+                                        record['total_ms'])
+            for key in ('total_ms', 'db_ms', 'serializer_ms', 'view_ms',
+                        'render_ms', 'queries', 'size'):
+                stats[key] += record[key]
+            stats['duplicated_queries'] += sum(
+                record['duplicates'].values()
+            )
+            self.duplicates[view].update(record['duplicates'])
+
+    def snapshot(self):
+        with self.lock:
+            views = {}
+            for view, stats in self.views.items():
+                requests = stats['requests']
+                views[view] = {
+                    'requests': int(requests),
+                    'max_total_ms': round(stats['max_total_ms'], 2),
+                    **{
+                        f'avg_{key}': round(stats[key] / requests, 2)
+                        for key in ('total_ms', 'db_ms', 'serializer_ms',
+                                    'view_ms', 'render_ms', 'queries',
+                                    'size', 'duplicated_queries')
+                    },
+                    'top_duplicates': dict(
+                        self.duplicates[view].most_common(5)
+                    ),
+                }
+            return {'pid': os.getpid(), 'views': views}
+
+    def reset(self):
+        with self.lock:
+            self.views.clear()
+            self.duplicates.clear()
+
+
+view_stats = ViewStats()
+
+
+class ConnectionHealthMiddleware:
+    # Включается DB_HEALTH_CHECKS=True: постоянное соединение,
+    # оборванное после перезапуска БД, закрывается до view.
+    def __init__(self, get_response):
+        if not settings.DB_HEALTH_CHECKS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for connection in connections.all():
+            if (connection.connection is not None
+                    and not connection.is_usable()):
+                connection.close()
+        return self.get_response(request)
+
+
+class ProfilingMiddleware:
+    # Включается PROFILING=True. Время делится на SQL, сериализаторы
+    # без SQL, остальной код view и рендеринг ответа.
+    def __init__(self, get_response):
+        if not settings.PROFILING:
+            raise MiddlewareNotUsed
+        BaseSerializer.data = property(profiled_serializer_data)
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        request._profiling_started = time.perf_counter()
+        token = current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(token)
+        finished = time.perf_counter()
+        self.record(request, response, profile, finished)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_view = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        request._profiling_render = time.perf_counter()
+        return response
+
+    def record(self, request, response, profile, finished):
+        started = request._profiling_started
+        view = getattr(request, '_profiling_view', started)
+        render = getattr(request, '_profiling_render', finished)
+        db_ms = profile.db_time * 1000
+        serializer_ms = profile.serializer_time * 1000
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round((finished - started) * 1000, 2),
+            'db_ms': round(db_ms, 2),
+            'serializer_ms': round(serializer_ms, 2),
+            'view_ms': round(
+                max((render - view) * 1000 - db_ms - serializer_ms, 0), 2
+            ),
+            'render_ms': round((finished - render) * 1000, 2),
+            'queries': sum(profile.queries.values()),
+            'duplicates': profile.duplicates,
+            'size': 0 if response.streaming else len(response.content),
+        }
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={record["db_ms"]:.1f};desc="{record["queries"]} SQL"',
+            f'serializer;dur={record["serializer_ms"]:.1f}',
+            f'view;dur={record["view_ms"]:.1f}',
+            f'render;dur={record["render_ms"]:.1f}',
+            f'total;dur={record["total_ms"]:.1f}',
+        ))
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        view_stats.add(f'{request.method} {view_name}', record)
+        logger.info(json.dumps(
+            {'view': view_name, **record}, ensure_ascii=False
+        ))
+
+
+class ReplicaMiddleware:
+    # Безопасные запросы читают с реплики, если автор запроса
+    # не писал в последние REPLICA_PIN_SECONDS секунд.
+    def __init__(self, get_response):
+        if not settings.DB_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def pin_key(self, request):
+        identity = (request.META.get('HTTP_AUTHORIZATION')
+                    or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+        if identity:
+            return f'db_pin:{md5(identity.encode()).hexdigest()}'
+        return None
+
+    def __call__(self, request):
+        key = self.pin_key(request)
+        database = None
+        if (request.method in ('GET', 'HEAD', 'OPTIONS')
+                and not request.path.startswith('/admin/')
+                and not (key and cache.get(key))):
+            database = choose_replica()
+        token = read_database.set(database)
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        if database is None and key and request.method not in (
+                'GET', 'HEAD', 'OPTIONS'):
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
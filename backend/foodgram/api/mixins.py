@@ -0,0 +1,235 @@
+import threading
+import time
+from collections import Counter
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from foodgram.routers import read_database
+from recipes.versions import get_version, get_versions
+
+PAGE_CACHE_EVENTS = ('hit', 'miss', 'stale', 'wait')
+
+
+# Счетчики в памяти процесса, без обращений к кешу на каждый запрос:
+# /api/_diagnostics/ показывает их для принявшего запрос воркера.
+page_cache_events = Counter()
+page_cache_lock = threading.Lock()
+
+
+def count_page_cache(event):
+    with page_cache_lock:
+        page_cache_events[event] += 1
+
+
+def page_cache_stats():
+    with page_cache_lock:
+        stats = {event: page_cache_events[event]
+                 for event in PAGE_CACHE_EVENTS}
+    total = sum(stats.values())
+    stats['hit_ratio'] = round(
+        (total - stats['miss']) / total, 4
+    ) if total else None
+    return stats
+
+
+def reset_page_cache_stats():
+    with page_cache_lock:
+        page_cache_events.clear()
+
+
+class VersionedCacheMixin:
+    # Кеширует готовый JSON списка и объекта до изменения cache_models.
+    cache_models = ()
+
+    def get_cache_key(self, request):
+        versions = '.'.join(
+            str(get_version(model)) for model in self.cache_models
+        )
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        key = f'{request.path}?{query}:{versions}'
+        return 'response:' + md5(key.encode()).hexdigest()
+
+    def cached_response(self, view, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        etag = f'"{key.split(":")[1]}"'
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+        content = cache.get(key)
+        if content is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = JSONRenderer().render(response.data)
+            cache.set(key, content, settings.RESPONSE_CACHE_TIMEOUT)
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+class ConditionalRetrieveMixin:
+    # ETag/Last-Modified для объекта. ETag строится из validator_fields
+    # (включая флаги юзера) и версий validator_models; при условном
+    # запросе они читаются одним запросом до загрузки объекта.
+    # If-Modified-Since проверяется, только если ответ не зависит
+    # от юзера: флаги юзера меняются без изменения объекта.
+    validator_fields = ()
+    validator_models = ()
+    last_modified_field = 'updated_at'
+
+    def get_validator_queryset(self):
+        return self.get_queryset()
+
+    def get_validator_fields(self):
+        return self.validator_fields
+
+    def get_validator_user(self):
+        # None — ответ одинаков для всех юзеров.
+        return self.request.user.pk
+
+    def get_validators(self, values):
+        versions = [get_version(model) for model in self.validator_models]
+        raw = repr((self.get_validator_user(), values, versions))
+        etag = f'"{md5(raw.encode()).hexdigest()}"'
+        modified = values[self.get_validator_fields().index(
+            self.last_modified_field
+        )]
+        return etag, int(modified.timestamp())
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_validator_fields()
+        if ('HTTP_IF_NONE_MATCH' in request.META
+                or 'HTTP_IF_MODIFIED_SINCE' in request.META):
+            lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+            values = self.get_validator_queryset().filter(
+                **{self.lookup_field: lookup}
+            ).values_list(*fields).first()
+            if values is not None:
+                etag, last_modified = self.get_validators(values)
+                response = get_conditional_response(
+                    request,
+                    etag=etag,
+                    last_modified=(last_modified
+                                   if self.get_validator_user() is None
+                                   else None),
+                )
+                if response is not None:
+                    return self.set_validators(response, etag, last_modified)
+        instance = self.get_object()
+        values = tuple(self.get_value(instance, field) for field in fields)
+        response = Response(self.get_serializer(instance).data)
+        return self.set_validators(response, *self.get_validators(values))
+
+    def get_value(self, instance, field):
+        for name in field.split('__'):
+            instance = getattr(instance, name)
+        return instance
+
+
+class AnonymousPageCacheMixin:
+    # Готовые страницы списка для анонимов. Ключ — нормализованные
+    # параметры запроса и версии зависимостей страницы
+    # (get_page_dependencies). Пока один запрос строит страницу,
+    # остальные отдают прошлую версию или ждут его результата.
+    def get_page_dependencies(self):
+        return ()
+
+    def get_page_params(self, request):
+        params = []
+        for name, values in request.query_params.lists():
+            values = sorted(value for value in values if value)
+            if name == 'page' and values == ['1']:
+                continue
+            if values:
+                params.append((name, values))
+        return sorted(params)
+
+    def get_page_cache_keys(self, request):
+        query = urlencode(self.get_page_params(request), doseq=True)
+        url = f'{request.build_absolute_uri(request.path)}?{query}'
+        page = md5(url.encode()).hexdigest()
+        versions = repr(get_versions(self.get_page_dependencies()))
+        version = md5(versions.encode()).hexdigest()
+        return f'page:{page}', f'page:{page}:{version}'
+
+    def build_page(self, view, request, *args, **kwargs):
+        # Реплика может отставать: страница под новой версией
+        # должна собираться из данных основной БД.
+        token = read_database.set(None)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            read_database.reset(token)
+        if response.status_code != 200:
+            return response, None
+        return response, JSONRenderer().render(response.data)
+
+    def cached_page(self, view, request, *args, **kwargs):
+        stale_key, key = self.get_page_cache_keys(request)
+        cached = cache.get_many([key, stale_key])
+        content, event = cached.get(key), 'hit'
+        lock = f'{key}:lock'
+        if content is None and cache.add(
+                lock, True, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            event = 'miss'
+            try:
+                response, content = self.build_page(
+                    view, request, *args, **kwargs
+                )
+                if content is None:
+                    return response
+                cache.set_many({key: content, stale_key: content},
+                               settings.PAGE_CACHE_TIMEOUT)
+            finally:
+                cache.delete(lock)
+        elif content is None and stale_key in cached:
+            content, event = cached[stale_key], 'stale'
+        elif content is None:
+            event = 'wait'
+            deadline = time.monotonic() + settings.PAGE_CACHE_LOCK_TIMEOUT
+            while content is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+                content = cache.get(key)
+            if content is None:
+                response, content = self.build_page(
+                    view, request, *args, **kwargs
+                )
+                if content is None:
+                    return response
+        count_page_cache(event)
+        response = HttpResponse(content, content_type='application/json')
+        response['X-Cache'] = event.upper()
+        patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        if (not request.user.is_anonymous
+                or not settings.PAGE_CACHE_TIMEOUT
+                or request.accepted_renderer.format != 'json'):
+            return super().list(request, *args, **kwargs)
+        return self.cached_page(super().list, request, *args, **kwargs)
@@ -0,0 +1,66 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def approximate_count(queryset):
+    # Оценка вместо COUNT(*): reltuples для всей таблицы,
+    # оценка планировщика для отфильтрованного запроса.
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                (queryset.model._meta.db_table,)
+            )
+            return max(cursor.fetchone()[0], 0)
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return cursor.fetchone()[0][0]['Plan']['Plan Rows']
+
+
+class KeysetPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        if settings.PAGINATION_APPROXIMATE_COUNT:
+            self.count = approximate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data = OrderedDict(
+                [('count', self.count), *response.data.items()]
+            )
+        return response
+
+
+class HybridPagination(PageNumberPagination):
+    # Номера страниц по умолчанию; ключевая пагинация по ?cursor=
+    # или ?pagination=cursor, порядок берется из view.keyset_ordering.
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if ('cursor' in request.query_params
+                or request.query_params.get('pagination') == 'cursor'):
+            self.keyset = KeysetPagination()
+            self.keyset.ordering = getattr(view, 'keyset_ordering', '-id')
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -1,15 +1,23 @@
-from django.shortcuts import get_object_or_404
-
 from rest_framework import serializers
 
-from djoser.serializers import UserSerializer
-
 import base64
 
-from django.core.files.base import ContentFile
+import binascii
+
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+
+from django.core.files import File
+
+from PIL import Image
+
+from django.db import transaction
 
 from users.models import User
 
+from recipes.images import VARIANTS, variant_urls
+
 from recipes.models import (
     Tag,
     Ingredient,
@@ -21,8 +29,22 @@ from recipes.models import (
 )
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class PersonalFieldsMixin:
+    # При context['personal'] == False поля, зависящие от юзера,
+    # не выводятся: такой ответ одинаков для всех.
+    personal_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('personal', True):
+            for name in self.personal_fields:
+                fields.pop(name)
+        return fields
+
+
+class CustomUserSerializer(PersonalFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    personal_fields = ('is_subscribed',)
 
     class Meta:
         model = User
@@ -36,6 +58,8 @@ class CustomUserSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context['request'].user
         return (not user.is_anonymous
                 and Subscribe.objects.filter(user=user, author=obj).exists())
@@ -63,18 +87,48 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    # Формат определяется по содержимому, а не по заголовку data:image/...
+    FORMATS = {
+        'JPEG': 'jpg',
+        'PNG': 'png',
+        'GIF': 'gif',
+        'WEBP': 'webp',
+    }
+    CHUNK_SIZE = 64 * 1024
+
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
-
+            data = self.decode(data.partition(';base64,')[2])
         return super().to_internal_value(data)
 
+    def decode(self, payload):
+        if len(payload) * 3 // 4 > settings.MAX_IMAGE_SIZE:
+            raise serializers.ValidationError(
+                f'Размер картинки не должен превышать '
+                f'{settings.MAX_IMAGE_SIZE // (1024 * 1024)} МБ.'
+            )
+        file = SpooledTemporaryFile(max_size=self.CHUNK_SIZE * 16)
+        try:
+            for start in range(0, len(payload), self.CHUNK_SIZE):
+                chunk = base64.b64decode(
+                    payload[start:start + self.CHUNK_SIZE], validate=True
+                )
+                file.write(chunk)
+            file.seek(0)
+            image_format = Image.open(file).format
+        except (binascii.Error, OSError):
+            raise serializers.ValidationError('Некорректная картинка.')
+        if image_format not in self.FORMATS:
+            raise serializers.ValidationError(
+                'Допустимые форматы: JPEG, PNG, GIF, WEBP.'
+            )
+        file.seek(0)
+        # Итоговое имя по хешу содержимого задает хранилище.
+        return File(file, name=f'image.{self.FORMATS[image_format]}')
+
 
 class RecipeSmallSerializer(serializers.ModelSerializer):
-    image = Base64ImageField()
+    image = serializers.SerializerMethodField()
     name = serializers.SerializerMethodField()
 
     class Meta:
@@ -90,6 +144,11 @@ class RecipeSmallSerializer(serializers.ModelSerializer):
         name = obj.name
         return name[:15]
 
+    def get_image(self, obj):
+        if not obj.image:
+            return None
+        return variant_urls(obj).get('subscription', obj.image.url)
+
 
 class FollowSerializer(serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
@@ -128,19 +187,20 @@ class FollowSerializer(serializers.ModelSerializer):
         return data
 
     def get_is_subscribed(self, obj):
-        return Subscribe.objects.filter(user=obj.user,
-                                        author=obj.author).exists()
+        return True
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        recipe = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            recipe = recipe[:int(recipes_limit)]
+        if hasattr(obj.author, 'limited_recipes'):
+            recipe = obj.author.limited_recipes
+        else:
+            recipe = Recipe.objects.filter(author=obj.author)
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit:
+                recipe = recipe[:recipes_limit]
         return RecipeSmallSerializer(recipe, many=True).data
 
     def get_recipes_count(self, obj):
-        return obj.author.recipes.count()
+        return obj.author.recipes_count
 
 
 class GetIngredientRecipeSerializer(serializers.ModelSerializer):
@@ -222,16 +282,18 @@ class ListShoppingSerialize(serializers.ModelSerializer):
         return data
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(PersonalFieldsMixin, serializers.ModelSerializer):
     image = Base64ImageField()
     ingredients = GetIngredientRecipeSerializer(
         many=True, source="ingredientrecipe_set"
     )
-    author = UserSerializer()
+    author = CustomUserSerializer()
     tags = TagSerializer(many=True)
     name = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    personal_fields = ('is_favorited', 'is_in_shopping_cart')
 
     class Meta:
         model = Recipe
@@ -245,7 +307,8 @@ class RecipeSerializer(serializers.ModelSerializer):
             'cooking_time',
             'is_favorited',
             'is_in_shopping_cart',
-            'image'
+            'image',
+            'image_srcset'
         )
         read_only_fields = ('author',)
 
@@ -253,12 +316,37 @@ class RecipeSerializer(serializers.ModelSerializer):
         name = obj.name
         return name[:15]
 
+    def to_representation(self, instance):
+        # Флаг подписки аннотирован на рецепте, а сериализуется у автора.
+        if hasattr(instance, 'author_is_subscribed'):
+            instance.author.is_subscribed = instance.author_is_subscribed
+        data = super().to_representation(instance)
+        if hasattr(instance, 'search_headline'):
+            data['search_headline'] = instance.search_headline
+        return data
+
+    def get_image_srcset(self, obj):
+        if not obj.image:
+            return None
+        request = self.context.get('request')
+        urls = variant_urls(obj)
+        # Без запроса (например, в командах) — относительные адреса.
+        build_uri = request.build_absolute_uri if request else str
+        return ', '.join(
+            f'{build_uri(urls[variant])} {width}w'
+            for variant, width in VARIANTS.items() if variant in urls
+        ) or None
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         return (not user.is_anonymous
                 and Favorite.objects.filter(user=user, recipe=obj).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         return (not user.is_anonymous
                 and ListShopping.objects.filter(user=user,
@@ -266,10 +354,7 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        source="ingredient",
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source="ingredient_id")
 
     class Meta:
         model = IngredientRecipe
@@ -282,10 +367,7 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientWriteSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField(max_length=None, use_url=True)
 
     class Meta:
@@ -303,59 +385,120 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         read_only_fields = ("author",)
 
     def validate(self, data):
-        ingredients = data["ingredients"]
-        tags = data["tags"]
-        if not tags:
-            message = 'Нужен хотя бы один тег.'
-            raise serializers.ValidationError(message)
-        for tag in tags:
-            if not Tag.objects.filter(name=tag).exists():
-                message = 'Такого тега нет.'
-                raise serializers.ValidationError(message)
-        if not ingredients:
-            message = 'Нужен хотя бы один ингредиент.'
-            raise serializers.ValidationError(message)
-        ingredient_list = []
-        for items in ingredients:
-            ingredient = get_object_or_404(Ingredient,
-                                           name=items["ingredient"])
-            if ingredient in ingredient_list:
-                message = 'Этот ингредиент уже есть в списке.'
-                raise serializers.ValidationError(message)
-            ingredient_list.append(ingredient)
+        errors = {}
+        if "tags" in data:
+            tag_ids = data["tags"]
+            unique_ids = set(tag_ids)
+            if not tag_ids:
+                errors["tags"] = ['Нужен хотя бы один тег.']
+            elif len(unique_ids) < len(tag_ids):
+                errors["tags"] = ['Теги не должны повторяться.']
+            else:
+                tags = Tag.objects.in_bulk(unique_ids)
+                missing = unique_ids - tags.keys()
+                if missing:
+                    errors["tags"] = [
+                        f'Таких тегов нет: {sorted(missing)}.'
+                    ]
+                data["tags"] = [tags[tag_id] for tag_id in tag_ids
+                                if tag_id in tags]
+        if "ingredients" in data:
+            ingredient_ids = [
+                items["ingredient_id"] for items in data["ingredients"]
+            ]
+            unique_ids = set(ingredient_ids)
+            if not ingredient_ids:
+                errors["ingredients"] = ['Нужен хотя бы один ингредиент.']
+            elif len(unique_ids) < len(ingredient_ids):
+                errors["ingredients"] = [
+                    'Этот ингредиент уже есть в списке.'
+                ]
+            else:
+                existing = set(
+                    Ingredient.objects.filter(id__in=unique_ids)
+                    .values_list('id', flat=True)
+                )
+                missing = unique_ids - existing
+                if missing:
+                    errors["ingredients"] = [
+                        f'Таких ингредиентов нет: {sorted(missing)}.'
+                    ]
+        if errors:
+            raise serializers.ValidationError(errors)
         return data
 
     @staticmethod
     def ingredient_create(ingredients, instance):
-        for ingredient_data in ingredients:
+        IngredientRecipe.objects.bulk_create(
             IngredientRecipe(
                 recipe=instance,
-                ingredient=ingredient_data['ingredient'],
+                ingredient_id=ingredient_data['ingredient_id'],
                 amount=ingredient_data['amount']
-            ).save()
+            )
+            for ingredient_data in ingredients
+        )
+
+    def ingredient_update(self, ingredients, instance):
+        # Блокируем рецепт, чтобы параллельные правки не пересеклись.
+        Recipe.objects.select_for_update().filter(pk=instance.pk).exists()
+        current = {
+            item.ingredient_id: item
+            for item in IngredientRecipe.objects.filter(recipe=instance)
+        }
+        amounts = {
+            ingredient_data['ingredient_id']: ingredient_data['amount']
+            for ingredient_data in ingredients
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=instance, ingredient_id__in=removed
+            ).delete()
+        changed = []
+        for ingredient_id, amount in amounts.items():
+            item = current.get(ingredient_id)
+            if item is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ('amount',))
+        self.ingredient_create(
+            [
+                ingredient_data for ingredient_data in ingredients
+                if ingredient_data['ingredient_id'] not in current
+            ],
+            instance
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         instance = super().create(validated_data)
         self.ingredient_create(ingredients, instance)
         instance.tags.set(tags)
+        # bulk_create не шлет сигналы, вектор пересчитывается явно.
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
         return instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if "ingredients" in validated_data:
             ingredients = validated_data.pop("ingredients")
-            instance.ingredients.clear()
-            self.ingredient_create(ingredients, instance)
+            self.ingredient_update(ingredients, instance)
         if "tags" in validated_data:
             tags = validated_data.pop("tags")
             instance.tags.set(tags)
         return super().update(instance, validated_data)
 
     def to_representation(self, obj):
+        request = self.context.get("request")
+        obj = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=obj.pk)
         return RecipeSerializer(
             obj,
             context={
-                "request": self.context.get("request"),
+                "request": request,
             },
         ).data
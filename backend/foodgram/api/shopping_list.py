@@ -0,0 +1,94 @@
+import csv
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models import Sum
+
+from recipes.models import IngredientRecipe
+
+FILENAME = 'List-shop'
+
+
+def get_shopping_list(user):
+    return (
+        IngredientRecipe.objects
+        .filter(recipe__recipes_listshopping_recipe__user=user)
+        .values(
+            'ingredient_id',
+            'ingredient__name',
+            'ingredient__measurement_unit',
+        )
+        .annotate(amount=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+    )
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_txt(rows):
+    for row in rows:
+        yield (f"{row['ingredient__name']}"
+               f"({row['ingredient__measurement_unit']}) - "
+               f"{row['amount']}\n")
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in rows:
+        yield writer.writerow((
+            row['ingredient__name'],
+            row['ingredient__measurement_unit'],
+            row['amount'],
+        ))
+
+
+def render_json(rows):
+    separator = ''
+    yield '['
+    for row in rows:
+        yield separator + json.dumps({
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def render_pdf(rows):
+    # PDF собирается целиком: формат не поддерживает потоковую запись.
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    pdfmetrics.registerFont(TTFont('ShoppingList', settings.PDF_FONT_PATH))
+    buffer = BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    top = height - 50
+    y = top
+    page.setFont('ShoppingList', 12)
+    for line in render_txt(rows):
+        if y < 50:
+            page.showPage()
+            page.setFont('ShoppingList', 12)
+            y = top
+        page.drawString(50, y, line.rstrip('\n'))
+        y -= 20
+    page.save()
+    yield buffer.getvalue()
+
+
+RENDERERS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
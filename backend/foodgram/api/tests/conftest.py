@@ -0,0 +1,38 @@
+import pytest
+from django.core.cache import cache
+
+from recipes.models import ListShopping, Recipe, Subscribe
+from users.models import User
+
+from .factories import create_recipes
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    # Загруженные в тестах картинки не попадают в media/ проекта.
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+
+
+@pytest.fixture
+def budget_user(db):
+    # Юзер, которого выбирает query_budget: с рецептами, подпиской
+    # и списком покупок; рецептов больше, чем на странице из 100.
+    user, author = (
+        User.objects.create_user(
+            username=name, email=f'{name}@example.com',
+            first_name=name, last_name=name, password='password',
+        )
+        for name in ('reader', 'author')
+    )
+    create_recipes(user, 120, ingredients_per_recipe=8)
+    Subscribe.objects.create(user=user, author=author)
+    ListShopping.objects.bulk_create(
+        ListShopping(user=user, recipe=recipe)
+        for recipe in Recipe.objects.all()[:10]
+    )
+    return user
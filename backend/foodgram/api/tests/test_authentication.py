@@ -0,0 +1,24 @@
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from users.authentication import TokenCache, token_cache
+from users.models import User
+
+
+@override_settings(TOKEN_CACHE_SHARED=True)
+class SharedTokenCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+
+    def test_revoked_token_is_rejected_by_other_workers(self):
+        key = Token.objects.create(user=self.user).key
+        # Второй экземпляр — кеш токенов другого воркера.
+        worker = TokenCache()
+        token_cache.set(key, self.user)
+        self.assertEqual(worker.get(key), self.user)
+        Token.objects.get(key=key).delete()
+        self.assertIsNone(worker.get(key))
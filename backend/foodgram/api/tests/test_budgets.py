@@ -0,0 +1,32 @@
+import pytest
+from django.db import transaction
+from rest_framework.test import APIClient
+
+from recipes.management.commands.query_budget import BUDGETS, Command
+
+
+def request(client, method, url, data):
+    response = getattr(client, method)(url, data, format='json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    assert response.status_code < 400, response.content
+
+
+@pytest.mark.parametrize('name', BUDGETS)
+def test_query_budget(name, budget_user, benchmark,
+                      django_assert_max_num_queries):
+    command = Command()
+    cases = command.get_cases(budget_user)
+    client = APIClient()
+    if not name.startswith('recipes_anonymous'):
+        client.force_authenticate(budget_user)
+    if name == 'recipes_anonymous_cached':
+        request(client, *cases['recipes_anonymous'])
+    # Точка сохранения для отката открывается вне подсчета:
+    # иначе она попала бы в число запросов внутри транзакции теста.
+    with transaction.atomic():
+        with django_assert_max_num_queries(BUDGETS[name]):
+            request(client, *cases[name])
+        transaction.set_rollback(True)
+    benchmark.pedantic(command.call, args=(client, *cases[name]),
+                       rounds=5, iterations=1)
@@ -0,0 +1,97 @@
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.counters import decrement, increment
+from recipes.models import Favorite, ListShopping, Recipe, Subscribe
+from users.authentication import token_cache
+from users.models import User
+
+
+class CounterOverwriteTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            cooking_time=10, image='recipes/img/test.png',
+        )
+
+    def test_recipe_save_keeps_counters(self):
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        increment(Recipe, recipe.pk, 'favorites_count')
+        recipe.name = 'Новое название'
+        recipe.save()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1)
+
+    def test_cached_user_save_keeps_counters(self):
+        increment(User, self.author.pk, 'followers_count')
+        token = Token.objects.create(user=self.author)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.addCleanup(token_cache.clear)
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        decrement(User, self.author.pk, 'followers_count')
+        response = client.patch('/api/users/me/', {'first_name': 'Новое'})
+        self.assertEqual(response.status_code, 200)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.first_name, 'Новое')
+        self.assertEqual(self.author.followers_count, 0)
+
+
+class CounterSignalsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.reader = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+
+    def create_recipe(self, author, name='Рецепт'):
+        return Recipe.objects.create(
+            author=author, name=name, text='Описание',
+            cooking_time=10, image='recipes/img/test.png',
+        )
+
+    def assertCounters(self, instance, **counters):
+        instance.refresh_from_db()
+        self.assertEqual(
+            {field: getattr(instance, field) for field in counters}, counters
+        )
+
+    def test_orm_changes_update_counters(self):
+        recipe = self.create_recipe(self.author)
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        ListShopping.objects.create(user=self.reader, recipe=recipe)
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        self.assertCounters(recipe, favorites_count=1, in_carts_count=1)
+        self.assertCounters(self.author, recipes_count=1, followers_count=1)
+        Favorite.objects.filter(recipe=recipe).delete()
+        self.assertCounters(recipe, favorites_count=0, in_carts_count=1)
+
+    def test_author_change_moves_recipe_count(self):
+        recipe = self.create_recipe(self.author)
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        recipe.author = self.reader
+        recipe.save()
+        self.assertCounters(self.author, recipes_count=0)
+        self.assertCounters(self.reader, recipes_count=1)
+
+    def test_user_delete_cascades_counters(self):
+        recipe = self.create_recipe(self.author)
+        own = self.create_recipe(self.reader, name='Свой рецепт')
+        Favorite.objects.create(user=self.reader, recipe=recipe)
+        Favorite.objects.create(user=self.author, recipe=own)
+        Subscribe.objects.create(user=self.reader, author=self.author)
+        self.reader.delete()
+        self.assertCounters(recipe, favorites_count=0)
+        self.assertCounters(self.author, recipes_count=1, followers_count=0)
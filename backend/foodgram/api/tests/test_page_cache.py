@@ -0,0 +1,47 @@
+from django.test import TestCase
+
+from recipes.models import Recipe
+from users.models import User
+
+from .factories import create_recipes
+
+
+class TouchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.recipe, = create_recipes(author, 1)
+
+    def test_touch_without_rows_keeps_pages(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            updated = Recipe.objects.filter(pk=0).touch()
+        self.assertEqual((updated, callbacks), (0, []))
+
+    def test_touch_invalidates_pages(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            updated = Recipe.objects.filter(pk=self.recipe.pk).touch()
+        self.assertEqual((updated, len(callbacks)), (1, 1))
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        create_recipes(cls.author, 3)
+
+    def test_author_values_are_normalized(self):
+        first = self.client.get(f'/api/recipes/?author=0{self.author.pk}')
+        second = self.client.get(f'/api/recipes/?author={self.author.pk}')
+        self.assertEqual((first['X-Cache'], second['X-Cache']),
+                         ('MISS', 'HIT'))
+        self.assertEqual(second.json()['count'], 3)
+
+    def test_invalid_author_is_rejected(self):
+        response = self.client.get('/api/recipes/?author=abc')
+        self.assertEqual(response.status_code, 400)
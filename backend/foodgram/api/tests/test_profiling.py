@@ -0,0 +1,40 @@
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.middleware import view_stats
+from users.models import User
+
+from .factories import create_recipes
+
+
+@override_settings(PROFILING=True)
+class ProfilingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='admin', email='admin@example.com',
+            first_name='Админ', last_name='Сайта', password='password',
+            is_staff=True,
+        )
+        create_recipes(cls.user, 10)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        view_stats.reset()
+        self.addCleanup(view_stats.reset)
+
+    def test_serializer_time_is_measured(self):
+        response = self.client.get('/api/recipes/')
+        timings = dict(
+            part.split(';')[0:2]
+            for part in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(
+            set(timings), {'db', 'serializer', 'view', 'render', 'total'}
+        )
+        self.assertGreater(float(timings['serializer'][4:]), 0)
+        stats = self.client.get('/api/_diagnostics/').data
+        recipes = stats['views']['GET api:recipes-list']
+        self.assertEqual(recipes['requests'], 1)
+        self.assertGreater(recipes['avg_serializer_ms'], 0)
@@ -0,0 +1,45 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, ListShopping, Subscribe
+from users.models import User
+
+from .factories import create_recipes
+
+
+class RecipeListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+        recipes = create_recipes(cls.author, 100)
+        Subscribe.objects.create(user=cls.user, author=cls.author)
+        for model in (Favorite, ListShopping):
+            model.objects.bulk_create(
+                model(user=cls.user, recipe=recipe) for recipe in recipes[::2]
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context), len(response.data['results'])
+
+    def test_page_size_does_not_change_query_count(self):
+        self.client.get('/api/recipes/')
+        small, small_size = self.count_queries('/api/recipes/?limit=6')
+        large, large_size = self.count_queries('/api/recipes/?limit=100')
+        self.assertEqual((small_size, large_size), (6, 100))
+        self.assertEqual(small, large)
@@ -0,0 +1,75 @@
+from collections import defaultdict
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram.routers import ReplicaRouter
+from users.authentication import token_cache
+from users.models import User
+
+from .factories import create_recipes
+
+
+class RecordingRouter(ReplicaRouter):
+    # Запоминает выбор роутера, но все запросы выполняет в default:
+    # в тестовой базе реплики нет.
+    def __init__(self):
+        self.reads = defaultdict(set)
+
+    def db_for_read(self, model, **hints):
+        alias = super().db_for_read(model, **hints) or 'default'
+        self.reads[model._meta.label_lower].add(alias)
+        return 'default'
+
+
+class ReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Рецептов', password='password',
+        )
+        cls.recipe, = create_recipes(cls.user, 1)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        self.router = RecordingRouter()
+        replicas = override_settings(DB_REPLICAS=['replica'],
+                                     DATABASE_ROUTERS=[self.router])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+        choose = mock.patch('api.middleware.choose_replica',
+                            return_value='replica0')
+        choose.start()
+        self.addCleanup(choose.stop)
+        self.addCleanup(token_cache.clear)
+        self.client = APIClient()
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_reads_go_to_replica(self):
+        self.authenticate()
+        response = self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.router.reads['recipes.recipe'], {'replica0'})
+        self.assertEqual(self.router.reads['authtoken.token'], {'default'})
+
+    def test_write_pins_reads_to_primary(self):
+        self.authenticate()
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(set().union(*self.router.reads.values()),
+                         {'default'})
+        self.router.reads.clear()
+        self.client.get(f'/api/recipes/{self.recipe.pk}/')
+        self.assertEqual(self.router.reads['recipes.recipe'], {'default'})
+
+    def test_page_cache_builds_from_primary(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.router.reads['recipes.recipe'], {'default'})
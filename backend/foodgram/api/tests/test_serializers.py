@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from api.serializers import RecipeSerializer
+from users.models import User
+
+from .factories import create_recipes
+
+
+class ImageSrcsetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com',
+            first_name='Автор', last_name='Рецептов', password='password',
+        )
+        cls.recipe, = create_recipes(author, 1)
+        cls.recipe.image_variants = True
+
+    def test_srcset_without_request_is_relative(self):
+        srcset = RecipeSerializer(context={}).get_image_srcset(self.recipe)
+        self.assertIn('/media/recipes/img/test.card.webp 480w', srcset)
+        self.assertNotIn('http', srcset)
@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserViewSet, TagViewSet,
-                    IngredientViewSet, RecipeViewSet)
+from .views import (CustomUserViewSet, DiagnosticsView, TagViewSet,
+                    IngredientViewSet, RecipeViewSet, health_live,
+                    health_ready)
 
 app_name = 'api'
 
@@ -16,4 +17,7 @@ v1_router.register('recipes', RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('', include(v1_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('_diagnostics/', DiagnosticsView.as_view(), name='diagnostics'),
+    path('health/live/', health_live, name='health-live'),
+    path('health/ready/', health_ready, name='health-ready'),
 ]
@@ -1,25 +1,42 @@
+from django.conf import settings
+
 from django.shortcuts import get_object_or_404
 
 from rest_framework import mixins, status, viewsets
 
+from rest_framework.views import APIView
+
 from rest_framework.decorators import action
 
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
-    IsAuthenticatedOrReadOnly
+    IsAuthenticatedOrReadOnly,
+    SAFE_METHODS
 )
 
+from rest_framework.exceptions import ValidationError
+
 from rest_framework.response import Response
 
 from djoser.views import UserViewSet
 
-from rest_framework.pagination import PageNumberPagination
-
-from django.http import FileResponse
+from django.http import JsonResponse, StreamingHttpResponse
 
 from users.models import User
 
+from recipes.autocomplete import ingredient_index
+
+from recipes.page_cache import (
+    LIST,
+    PAGES,
+    author_dependency,
+    tag_dependency
+)
+
+from recipes.tags import get_tag_map
+
 from recipes.models import (
     Tag,
     Ingredient,
@@ -40,15 +57,35 @@ from .serializers import (
     ListShoppingSerialize
 )
 
-from .filters import IngredientFilter, RecipeFilter
+from .filters import RecipeFilter
+
+from .middleware import view_stats
+
+from .mixins import (
+    AnonymousPageCacheMixin,
+    ConditionalRetrieveMixin,
+    VersionedCacheMixin,
+    page_cache_stats,
+    reset_page_cache_stats
+)
+
+from .pagination import HybridPagination, KeysetPagination
 
 from .permissions import IsAuthotOrAuthenticatedOrReadOnly
 
-from django.db.models import Sum
+from django.db import DatabaseError, connections, transaction
+
+from django.db.models import Exists, OuterRef, Prefetch
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from rest_framework.filters import SearchFilter
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from .shopping_list import FILENAME, RENDERERS, get_shopping_list
+
+
+PERSONAL_FLAGS = ('is_favorited', 'is_in_shopping_cart',
+                  'author_is_subscribed')
 
 
 class ListRetrieveGenericModelViewSet(mixins.ListModelMixin,
@@ -57,10 +94,47 @@ class ListRetrieveGenericModelViewSet(mixins.ListModelMixin,
     pass
 
 
+class IgnoreFormatNegotiation(DefaultContentNegotiation):
+    # ?format= задает формат файла, а не рендерер DRF.
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def get_ids(request, name):
+    value = request.query_params.get(name, '')
+    ids = value.split(',') if value else []
+    if not all(pk.isdigit() for pk in ids):
+        raise ValidationError({name: ['Нужен список id через запятую.']})
+    if len(ids) > settings.MAX_PAGE_SIZE:
+        raise ValidationError({name: [
+            f'Не больше {settings.MAX_PAGE_SIZE} id за запрос.'
+        ]})
+    return {int(pk) for pk in ids}
+
+
+def get_positive_int(request, name):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) < 1:
+        raise ValidationError({name: ['Нужно целое положительное число.']})
+    return int(value)
+
+
 class CustomUserViewSet(UserViewSet):
     serializer_class = CustomUserSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
-    pagination_class = PageNumberPagination
+    pagination_class = HybridPagination
+    keyset_ordering = 'id'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset
+        return queryset.annotate(is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+        ))
 
     @action(
         detail=True,
@@ -72,14 +146,20 @@ class CustomUserViewSet(UserViewSet):
         author = get_object_or_404(User, id=id)
         serializer = FollowSerializer(
             data=request.data,
-            context={'request': request, 'author': author}
+            context={
+                'request': request,
+                'author': author,
+                'recipes_limit': get_positive_int(request, 'recipes_limit'),
+            }
         )
         if self.request.method == 'POST':
             serializer.is_valid(raise_exception=True)
-            serializer.save(user=user, author=author)
+            with transaction.atomic():
+                serializer.save(user=user, author=author)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         subs = get_object_or_404(Subscribe, user=user, author=author)
-        subs.delete()
+        with transaction.atomic():
+            subs.delete()
         message = {'Подписка успешно удалена'}
         return Response(message, status=status.HTTP_204_NO_CONTENT)
 
@@ -89,7 +169,17 @@ class CustomUserViewSet(UserViewSet):
         methods=['GET']
     )
     def subscriptions(self, request):
-        queryset = Subscribe.objects.filter(user=request.user).order_by('id')
+        recipes_limit = get_positive_int(request, 'recipes_limit')
+        recipes = Recipe.objects.all()
+        if recipes_limit:
+            recipes = recipes.filter(
+                author__following__user=request.user
+            ).limit_per_author(recipes_limit)
+        queryset = Subscribe.objects.filter(
+            user=request.user
+        ).select_related('author').prefetch_related(Prefetch(
+            'author__recipes', queryset=recipes, to_attr='limited_recipes'
+        )).order_by('id')
         page = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             page,
@@ -99,44 +189,121 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(ListRetrieveGenericModelViewSet):
+class TagViewSet(VersionedCacheMixin, ListRetrieveGenericModelViewSet):
+    cache_models = (Tag,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
 
 
-class IngredientViewSet(ListRetrieveGenericModelViewSet):
+class IngredientViewSet(VersionedCacheMixin,
+                        ListRetrieveGenericModelViewSet):
+    cache_models = (Ingredient,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = (AllowAny,)
-    filter_backends = (DjangoFilterBackend, SearchFilter)
-    filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        limit = get_positive_int(request, 'limit')
+        name = request.query_params.get('name', '')
+        return Response(ingredient_index.search(name, limit))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(ConditionalRetrieveMixin, AnonymousPageCacheMixin,
+                    viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthotOrAuthenticatedOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    validator_fields = (
+        'updated_at',
+        'is_favorited',
+        'is_in_shopping_cart',
+        'author_is_subscribed',
+        'author__email',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+    )
+    validator_models = (Tag, Ingredient)
+
+    @property
+    def personal(self):
+        # ?personal=0: ответ без флагов юзера, общий для всех;
+        # флаги отдельно отдает /api/recipes/flags/.
+        return self.request.query_params.get('personal') not in ('0',
+                                                                 'false')
+
+    def get_page_dependencies(self):
+        # Страница с фильтром по тегам или автору меняется только
+        # вместе с их рецептами, без фильтра — с любым рецептом.
+        params = self.request.query_params
+        tag_map = get_tag_map() if 'tags' in params else {}
+        dependencies = sorted({
+            tag_dependency(tag_map[slug])
+            for slug in params.getlist('tags') if slug in tag_map
+        } | {author_dependency(author) for author in self.get_author_ids()})
+        return [PAGES, Tag, Ingredient, *(dependencies or [LIST])]
+
+    def get_page_params(self, request):
+        # ?author=05 и ?author=5 — одна и та же страница.
+        return sorted(
+            (name, [str(author) for author in self.get_author_ids()]
+             if name == 'author' else values)
+            for name, values in super().get_page_params(request)
+        )
 
-    # Все ровно ошибку выдает.
-    # AttributeError: Cannot find 'recipe' on Recipe object,
-    # 'recipe__ingredients__ingredient' is an invalid
-    # parameter to prefetch_related()
-    # def get_queryset(self):
-    #     recipes = Recipe.objects.prefetch_related(
-    #         'recipe__ingredients__ingredient', 'tags'
-    #     ).all()
-    #     return recipes
+    def get_author_ids(self):
+        authors = [
+            author for author in self.request.query_params.getlist('author')
+            if author
+        ]
+        if not all(author.isdigit() and int(author) > 0
+                   for author in authors):
+            raise ValidationError(
+                {'author': ['Нужно целое положительное число.']}
+            )
+        return sorted({int(author) for author in authors})
+
+    def get_validator_queryset(self):
+        if self.personal:
+            return Recipe.objects.with_user_flags(self.request.user)
+        return Recipe.objects.all()
+
+    def get_validator_fields(self):
+        if self.personal:
+            return self.validator_fields
+        return tuple(field for field in self.validator_fields
+                     if field not in PERSONAL_FLAGS)
+
+    def get_validator_user(self):
+        return self.request.user.pk if self.personal else None
+
+    def get_queryset(self):
+        queryset = Recipe.objects.all()
+        if self.personal:
+            queryset = queryset.with_user_flags(self.request.user)
+        if self.request.method in SAFE_METHODS:
+            return queryset.with_related()
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['personal'] = self.personal
+        return context
 
     def get_serializer_class(self):
         if self.action == 'create' or self.action == 'partial_update':
             return RecipeWriteSerializer
         return RecipeSerializer
 
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -152,13 +319,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         serializer.is_valid(raise_exception=True)
         recipe = get_object_or_404(Recipe, id=pk)
-        if request.method == "POST":
-            serializer.save(user=user, recipe=recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        Favorite.objects.filter(
-            user=user,
-            recipe=recipe
-        ).delete()
+        with transaction.atomic():
+            if request.method == "POST":
+                serializer.save(user=user, recipe=recipe)
+                return Response(serializer.data,
+                                status=status.HTTP_201_CREATED)
+            Favorite.objects.filter(user=user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -173,45 +339,92 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = request.user
         serializer.is_valid(raise_exception=True)
         recipe = get_object_or_404(Recipe, id=pk)
-        if request.method == "POST":
-            serializer.save(user=user, recipe=recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        ListShopping.objects.filter(
-            user=user,
-            recipe=recipe
-        ).delete()
+        with transaction.atomic():
+            if request.method == "POST":
+                serializer.save(user=user, recipe=recipe)
+                return Response(serializer.data,
+                                status=status.HTTP_201_CREATED)
+            ListShopping.objects.filter(user=user, recipe=recipe).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         methods=['get'],
         detail=False,
+        permission_classes=[IsAuthenticated],
     )
-    def download_shopping_cart(self, request):
+    def flags(self, request):
+        # Флаги юзера для многих рецептов одним запросом.
+        flags = Recipe.objects.filter(
+            pk__in=get_ids(request, 'ids')
+        ).with_user_flags(request.user).values('id', *PERSONAL_FLAGS)
+        return Response(list(flags))
 
-        instance = (
-            ListShopping.objects.filter(user=request.user)
-            .values(
-                "recipe__ingredients__name",
-                "recipe__ingredients__measurement_unit",
-            )
-            .annotate(amount=Sum("recipe__ingredientrecipe__amount"))
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination,
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            author__following__user=request.user
         )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
-        data = {}
-        for ingredient in instance:
-            if ingredient['recipe__ingredients__name'] in data:
-                data[
-                    f"{ingredient['recipe__ingredients__name']}"
-                    f"({ingredient['recipe__ingredients__measurement_unit']})"
-                ] += ingredient['amount']
-            else:
-                data[
-                    f"{ingredient['recipe__ingredients__name']}"
-                    f"({ingredient['recipe__ingredients__measurement_unit']})"
-                ] = ingredient['amount']
-        content = ''
-        for ingredient, amount in data.items():
-            content += f'{ingredient} - {amount}\n'
-        response = FileResponse(content, content_type='whatever')
-        response['Content-Disposition'] = 'attachment; filename=List-shop.txt'
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatNegotiation,
+    )
+    def download_shopping_cart(self, request):
+        file_format = request.query_params.get('format', 'txt')
+        if file_format not in RENDERERS:
+            message = {'format': [
+                f'Допустимые форматы: {", ".join(RENDERERS)}.'
+            ]}
+            return Response(message, status=status.HTTP_400_BAD_REQUEST)
+        render, content_type = RENDERERS[file_format]
+        # Строки читаются до ответа: потоковый ответ перебирается уже
+        # после middleware, вне выбора реплики и профилирования.
+        # Строк не больше, чем разных ингредиентов в списке.
+        rows = list(get_shopping_list(request.user))
+        response = StreamingHttpResponse(
+            render(rows), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={FILENAME}.{file_format}'
+        )
         return response
+
+
+class DiagnosticsView(APIView):
+    # Сводка ProfilingMiddleware и счетчики кеша страниц рецептов
+    # только по воркеру, принявшему запрос (pid в ответе).
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response({**view_stats.snapshot(),
+                         'page_cache': page_cache_stats()})
+
+    def delete(self, request):
+        view_stats.reset()
+        reset_page_cache_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def health_live(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def health_ready(request):
+    # Обычная view без DRF: ни аутентификации, ни лишних запросов.
+    try:
+        for connection in connections.all():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+    except DatabaseError:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    return JsonResponse({'status': 'ok'})
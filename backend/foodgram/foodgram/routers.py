@@ -0,0 +1,36 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Реплика для чтения в текущем запросе; None — основная БД.
+# Задается ReplicaMiddleware только для безопасных запросов.
+read_database = ContextVar('read_database', default=None)
+
+# Токены читаются с основной БД: токен, выданный при входе,
+# может еще не дойти до реплики к следующему запросу.
+PRIMARY_MODELS = {'authtoken.token', 'sessions.session'}
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+def choose_replica():
+    return random.choice(get_replicas())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.label_lower in PRIMARY_MODELS:
+            return 'default'
+        return read_database.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
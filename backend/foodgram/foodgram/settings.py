@@ -13,6 +13,8 @@ import os
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -50,6 +53,9 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    'api.middleware.ConnectionHealthMiddleware',
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +89,26 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# За pgbouncer в режиме transaction: серверные курсоры и параметры
+# запуска соединения не переживают смену серверного соединения.
+DB_PGBOUNCER = os.getenv('DB_PGBOUNCER', 'False') == 'True'
+
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+# Мс, 0 — без ограничения. За pgbouncer задается на роли:
+# ALTER ROLE ... SET statement_timeout = ...
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+
+# Проверка постоянного соединения в начале запроса (SELECT 1):
+# после перезапуска БД запрос не падает на мертвом соединении.
+DB_HEALTH_CHECKS = os.getenv('DB_HEALTH_CHECKS', 'False') == 'True'
+
+DB_OPTIONS = {
+    'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+}
+if DB_STATEMENT_TIMEOUT and not DB_PGBOUNCER:
+    DB_OPTIONS['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT}'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -90,10 +116,72 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': DB_OPTIONS,
     }
 }
 
+# Реплики только для чтения: DB_REPLICAS=host1,host2:5433.
+# GET-запросы читают с реплики, остальные — с основной БД.
+DB_REPLICAS = [host for host in os.getenv('DB_REPLICAS', '').split(',')
+               if host]
+for number, replica in enumerate(DB_REPLICAS):
+    host, _, port = replica.partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+if DB_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+# Сколько секунд после записи юзер читает с основной БД,
+# чтобы видеть свои изменения несмотря на отставание реплики.
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+
+# В кеше живут версии справочников, готовые ответы и страницы.
+# LocMemCache — своя копия в каждом процессе: версию, поднятую
+# другим воркером или командой manage.py, сервер не увидит, и ответы
+# останутся старыми до RESPONSE_CACHE_TIMEOUT. Он годится только для
+# одного процесса без внешних команд; docker-compose подключает
+# memcached (django.core.cache.backends.memcached.PyMemcacheCache).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+LOCAL_CACHE = CACHES['default']['BACKEND'].endswith('LocMemCache')
+
+if LOCAL_CACHE and int(os.getenv('GUNICORN_WORKERS', 1)) > 1:
+    raise ImproperlyConfigured(
+        'Несколько воркеров требуют общего кеша: задайте CACHE_BACKEND.'
+    )
+
+# Закрепление юзера за основной БД после записи хранится в кеше:
+# в LocMemCache его не увидят другие воркеры.
+if LOCAL_CACHE and DB_REPLICAS:
+    raise ImproperlyConfigured(
+        'DB_REPLICAS требует общего кеша: задайте CACHE_BACKEND.'
+    )
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 3600))
+
+# Кеш страниц /api/recipes/ для анонимов; 0 отключает кеш.
+# Пока страница строится, остальные запросы ждут не дольше
+# PAGE_CACHE_LOCK_TIMEOUT секунд.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 300))
+
+PAGE_CACHE_LOCK_TIMEOUT = int(os.getenv('PAGE_CACHE_LOCK_TIMEOUT', 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -147,13 +235,61 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
 
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.HybridPagination',
     'PAGE_SIZE': 6,
 }
 
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', 100))
+
+PAGINATION_APPROXIMATE_COUNT = (
+    os.getenv('PAGINATION_APPROXIMATE_COUNT', 'False') == 'True'
+)
+
+MAX_IMAGE_SIZE = int(os.getenv('MAX_IMAGE_SIZE', 5 * 1024 * 1024))
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# SQL, время и размер ответа по каждому запросу: заголовок
+# Server-Timing, лог api.middleware и /api/_diagnostics/.
+PROFILING = os.getenv('PROFILING', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Кеш токенов: число записей в процессе, срок жизни в секундах
+# и общий кеш Django для нескольких воркеров (по умолчанию включен,
+# если CACHE_BACKEND не LocMemCache).
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 10000))
+
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+
+TOKEN_CACHE_SHARED = os.getenv(
+    'TOKEN_CACHE_SHARED', str(not LOCAL_CACHE)
+) == 'True'
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
@@ -0,0 +1,17 @@
+# Режим сервера задается SERVER_MODE:
+#   sync   — синхронные воркеры WSGI (по умолчанию);
+#   thread — WSGI с потоками: медленный запрос к БД занимает поток,
+#            а не весь воркер.
+# Режима ASGI нет: в Django 3.2 ASGIHandler выполняет синхронные view
+# и middleware на одном общем потоке процесса, то есть по очереди.
+import os
+
+mode = os.getenv('SERVER_MODE', 'sync')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+wsgi_app = 'foodgram.wsgi:application'
+
+if mode == 'thread':
+    worker_class = 'gthread'
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
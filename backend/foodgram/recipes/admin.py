@@ -77,7 +77,11 @@ class RecipeAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
     def count_favorites(self, obj):
-        return obj.recipes_favorite_recipe.count()
+        return obj.favorites_count
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_search_vector()
 
     def short_name(self, obj):
         return obj.name[:15]
@@ -91,6 +95,19 @@ class IngredientRecipeAdmin(admin.ModelAdmin):
     list_filter = (RecipeFilter, 'ingredient',)
     empty_value_display = '-пусто-'
 
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recipes = Recipe.objects.filter(pk=obj.recipe_id)
+        recipes.update_search_vector()
+        recipes.touch()
+
+    def delete_queryset(self, request, queryset):
+        recipes = set(queryset.values_list('recipe_id', flat=True))
+        super().delete_queryset(request, queryset)
+        recipes = Recipe.objects.filter(pk__in=recipes)
+        recipes.update_search_vector()
+        recipes.touch()
+
 
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
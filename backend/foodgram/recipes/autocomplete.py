@@ -0,0 +1,74 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from django.conf import settings
+
+from .versions import get_version
+
+
+class IngredientIndex:
+    # Отсортированный по названию список ингредиентов в памяти процесса:
+    # префиксный поиск — бинарный, подстрочный — проход по массиву.
+    def __init__(self):
+        self._lock = Lock()
+        self._data = None
+        self._loaded_at = 0
+
+    def invalidate(self):
+        self._data = None
+
+    def _load(self):
+        from .models import Ingredient
+
+        rows = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        return keys, items
+
+    def _get(self):
+        from .models import Ingredient
+
+        version = get_version(Ingredient)
+        data = self._data
+        expired = (
+            time.monotonic() - self._loaded_at
+            > settings.INGREDIENT_INDEX_TTL
+        )
+        if data is None or expired or version != self._version:
+            with self._lock:
+                if self._data is data:
+                    self._data = self._load()
+                    self._version = version
+                    self._loaded_at = time.monotonic()
+                data = self._data
+        return data
+
+    def search(self, query, limit=None):
+        keys, items = self._get()
+        query = query.strip().casefold()
+        if not query:
+            return items[:limit]
+        start = bisect_left(keys, query)
+        end = bisect_left(keys, query[:-1] + chr(ord(query[-1]) + 1), start)
+        result = items[start:end]
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+        substring = sorted(
+            (key.find(query), index)
+            for index, key in enumerate(keys)
+            if not start <= index < end and query in key
+        )
+        result.extend(items[index] for _, index in substring)
+        return result[:limit]
+
+
+ingredient_index = IngredientIndex()
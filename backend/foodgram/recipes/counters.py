@@ -0,0 +1,79 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from users.models import User
+
+from .models import Favorite, ListShopping, Recipe, Subscribe
+
+
+def increment(model, pk, field):
+    model.objects.filter(pk=pk).update(**{field: F(field) + 1})
+
+
+def decrement(model, pk, field):
+    model.objects.filter(pk=pk, **{f'{field}__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+def count_subquery(model, field, exclude=None, **filters):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}, **filters)
+        .exclude(**(exclude or {}))
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ListShopping, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscribe, 'author'),
+    },
+}
+
+
+def counter_sources(model):
+    # (модель счетчика, поле счетчика, внешний ключ) для строк model.
+    return [
+        (target, field, key)
+        for target, counters in COUNTERS.items()
+        for field, (source, key) in counters.items()
+        if source is model
+    ]
+
+
+def recount(model, batch_size):
+    # Пересчитывает счетчики пачками по первичному ключу и возвращает
+    # число исправленных строк.
+    counters = {
+        field: count_subquery(*source)
+        for field, source in COUNTERS[model].items()
+    }
+    fixed = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return fixed
+        last_pk = batch[-1]
+        queryset = model.objects.filter(pk__in=batch)
+        for field, counter in counters.items():
+            drifted = (
+                queryset.annotate(actual=counter)
+                .exclude(**{field: F('actual')})
+                .values_list('pk', flat=True)
+            )
+            fixed += model.objects.filter(pk__in=list(drifted)).update(
+                **{field: counter}
+            )
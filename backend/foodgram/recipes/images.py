@@ -0,0 +1,82 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+
+from PIL import Image
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Ширина вариантов: карточка в подписках, карточка в списке, страница рецепта.
+VARIANTS = {
+    'subscription': 160,
+    'card': 480,
+    'detail': 1024,
+}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS,
+    thread_name_prefix='images',
+)
+
+
+def variant_name(name, variant):
+    return f'{name.rsplit(".", 1)[0]}.{variant}.webp'
+
+
+def get_storage():
+    return Recipe._meta.get_field('image').storage
+
+
+def generate_variants(name):
+    # Работает в потоке пула: соединение потока закрывается так же,
+    # как после запроса, по CONN_MAX_AGE и при ошибках.
+    close_old_connections()
+    storage = get_storage()
+    try:
+        with storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            transparent = ('A' in image.getbands()
+                           or 'transparency' in image.info)
+            image = image.convert('RGBA' if transparent else 'RGB')
+        for variant, width in VARIANTS.items():
+            target = variant_name(name, variant)
+            if storage.exists(target):
+                continue
+            resized = image.copy()
+            resized.thumbnail((width, width * 4))
+            buffer = BytesIO()
+            resized.save(buffer, 'WEBP', quality=80)
+            storage.save(target, ContentFile(buffer.getvalue()))
+        # Флаг на строке избавляет сериализацию от проверок файлов;
+        # варианты меняют image_srcset в ответах с рецептами.
+        recipes = Recipe.objects.filter(image=name, image_variants=False)
+        Recipe.objects.filter(
+            pk__in=list(recipes.values_list('pk', flat=True))
+        ).touch(image_variants=True)
+    except Exception:
+        logger.exception('Не удалось создать варианты для %s', name)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(name):
+    executor.submit(generate_variants, name)
+
+
+def variant_urls(recipe):
+    # До создания вариантов (image_variants) отдается оригинал.
+    if not recipe.image_variants:
+        return {}
+    storage = recipe.image.storage
+    return {
+        variant: storage.url(variant_name(recipe.image.name, variant))
+        for variant in VARIANTS
+    }
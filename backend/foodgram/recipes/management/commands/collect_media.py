@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from recipes.images import VARIANTS, get_storage, variant_name
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Удаление картинок рецептов, на которые нет ссылок"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--min-age', type=int, default=3600,
+                            help='Не трогать файлы моложе стольких секунд')
+
+    def handle(self, *args, **options):
+        storage = get_storage()
+        # Файл загружается до коммита строки рецепта: свежие файлы
+        # без ссылок могут принадлежать незавершенной транзакции.
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        referenced = set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        keep = referenced | {
+            variant_name(name, variant)
+            for name in referenced for variant in VARIANTS
+        }
+        upload_to = Recipe._meta.get_field('image').upload_to
+        removed = 0
+        for name in list(storage.walk(upload_to.rstrip('/'))):
+            if name in keep or storage.get_modified_time(name) > cutoff:
+                continue
+            if not options['dry_run']:
+                storage.delete(name)
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено файлов без ссылок: {removed}"
+        ))
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Создание уменьшенных WebP-копий картинок рецептов"
+
+    def handle(self, *args, **kwargs):
+        names = (
+            Recipe.objects.exclude(image='')
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        for name in names.iterator():
+            generate_variants(name)
+        self.stdout.write(self.style.SUCCESS("Картинки обработаны!"))
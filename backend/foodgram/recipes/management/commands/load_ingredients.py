@@ -1,20 +1,104 @@
+import csv
 import json
+import time
+from itertools import islice
+from pathlib import Path
 
 from foodgram.settings import BASE_DIR
 
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
 
 from recipes.models import Ingredient
+from recipes.versions import bump_version
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield {'name': name, 'measurement_unit': measurement_unit}
+
+
+def read_json(file):
+    # Потоковый разбор массива объектов без загрузки файла целиком.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        buffer += chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break
+            yield item
+        buffer = buffer[position:]
+        if not chunk:
+            if buffer.strip():
+                raise CommandError('Некорректный JSON в файле ингредиентов.')
+            return
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = "Загрузка ингредиентов из ingredients.json"
-
-    def handle(self, *args, **kwargs):
-        file = f"{BASE_DIR}/data/ingredients.json"
-        with open(file, "r",
-                  encoding="utf-8") as file:
-            reader = json.load(file)
-        for ingredient in reader:
-            Ingredient.objects.get_or_create(**ingredient)
-        self.stdout.write(self.style.SUCCESS("Ингредиенты загружены!"))
+    help = "Загрузка ингредиентов из ingredients.json или ingredients.csv"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=f"{BASE_DIR}/data/ingredients.json",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        reader = READERS.get(path.suffix)
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size должен быть не меньше 1.')
+        before = Ingredient.objects.count()
+        processed = 0
+        started = time.monotonic()
+        with open(path, "r", encoding="utf-8") as file:
+            rows = reader(file)
+            while True:
+                batch = [
+                    Ingredient(**ingredient)
+                    for ingredient in islice(rows, batch_size)
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Обработано {processed} '
+                    f'({processed / max(elapsed, 0.001):.0f} строк/с)'
+                )
+        # Через общий кеш версия доходит до индекса и кеша ответов
+        # в процессах сервера.
+        bump_version(Ingredient)
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f"Ингредиенты загружены! Добавлено {created} из {processed}."
+        ))
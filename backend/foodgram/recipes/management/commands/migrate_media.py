@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand, call_command
+
+from recipes.images import get_storage
+from recipes.models import Recipe
+from recipes.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = "Перенос картинок рецептов в хранилище с именами по хешу"
+
+    def handle(self, *args, **kwargs):
+        storage = get_storage()
+        migrated = 0
+        recipes = Recipe.objects.exclude(image='').values_list('id', 'image')
+        for pk, name in recipes.iterator():
+            if is_content_addressed(name):
+                continue
+            if not storage.exists(name):
+                self.stderr.write(f'Файл {name} рецепта {pk} не найден.')
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            # update() без сигналов: старый файл уберет collect_media.
+            Recipe.objects.filter(pk=pk).update(image=new_name)
+            migrated += 1
+        self.stdout.write(f'Перенесено картинок: {migrated}')
+        call_command('collect_media', stdout=self.stdout)
+        call_command('generate_image_variants', stdout=self.stdout)
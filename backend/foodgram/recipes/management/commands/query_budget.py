@@ -0,0 +1,157 @@
+import statistics
+import time
+from tempfile import TemporaryDirectory
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe
+from users.models import User
+
+# Предельное число SQL-запросов на один вызов эндпоинта.
+# Не зависит от объема данных: рост означает N+1 или лишний запрос.
+BUDGETS = {
+    'recipes': 4,
+    'recipes_large_page': 4,
+    'recipes_anonymous': 4,
+    'recipes_anonymous_cached': 0,
+    'recipes_filtered': 5,
+    'recipe_detail': 3,
+    'subscriptions': 3,
+    'ingredients': 1,
+    'download_shopping_cart': 1,
+    'recipe_create': 17,
+    'recipe_update': 16,
+}
+
+
+def recipe_payload(ingredients, tags):
+    return {
+        'name': 'Рецепт для замера',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': (
+            'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAA'
+            'fFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+        ),
+        'ingredients': [
+            {'id': pk, 'amount': amount}
+            for amount, pk in enumerate(ingredients, 1)
+        ],
+        'tags': tags,
+    }
+
+
+class Command(BaseCommand):
+    help = "Проверка числа SQL-запросов и времени ответа основных эндпоинтов"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Email юзера для запросов')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        user = User.objects.filter(
+            follower__isnull=False,
+            recipes_listshopping_user__isnull=False,
+            recipes__isnull=False,
+        ).first()
+        if user is None:
+            raise CommandError(
+                'Нет юзера с рецептами, подписками и списком покупок: '
+                'сначала выполните seed_data.'
+            )
+        return user
+
+    def get_cases(self, user):
+        recipe = Recipe.objects.filter(author=user).first()
+        ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)[:8]
+        )
+        tags = list(recipe.tags.values_list('id', flat=True))
+        name = Ingredient.objects.values_list('name', flat=True).first()
+        return {
+            'recipes': ('get', '/api/recipes/', None),
+            # Тот же бюджет, что у страницы из 6: ловит N+1 по размеру.
+            'recipes_large_page': ('get', '/api/recipes/?limit=100', None),
+            'recipes_anonymous': ('get', '/api/recipes/', None),
+            # Та же страница уже в кеше после recipes_anonymous.
+            'recipes_anonymous_cached': ('get', '/api/recipes/', None),
+            'recipes_filtered': (
+                'get',
+                '/api/recipes/?is_favorited=0&tags=breakfast&tags=lunch',
+                None,
+            ),
+            'recipe_detail': ('get', f'/api/recipes/{recipe.pk}/', None),
+            'subscriptions': (
+                'get', '/api/users/subscriptions/?recipes_limit=3', None
+            ),
+            'ingredients': ('get', f'/api/ingredients/?name={name[:3]}', None),
+            'download_shopping_cart': (
+                'get', '/api/recipes/download_shopping_cart/', None
+            ),
+            'recipe_create': (
+                'post', '/api/recipes/', recipe_payload(ingredients, tags)
+            ),
+            'recipe_update': (
+                'patch',
+                f'/api/recipes/{recipe.pk}/',
+                recipe_payload(ingredients[::-1], tags),
+            ),
+        }
+
+    def call(self, client, method, url, data):
+        # Изменения откатываются, чтобы замеры можно было повторять.
+        with transaction.atomic():
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise CommandError(f'{method.upper()} {url}: '
+                               f'{response.status_code} {response.content}')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        setup_test_environment()
+        # Картинки из recipe_create и recipe_update пишутся во временный
+        # каталог, а не в MEDIA_ROOT сервера.
+        try:
+            with TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root):
+                failed = self.run(user, options['repeat'])
+        finally:
+            teardown_test_environment()
+        if failed:
+            raise CommandError('Превышен бюджет запросов: '
+                               + ', '.join(failed))
+        self.stdout.write(self.style.SUCCESS('Бюджеты запросов соблюдены!'))
+
+    def run(self, user, repeat):
+        failed = []
+        for name, (method, url, data) in self.get_cases(user).items():
+            client = APIClient()
+            if not name.startswith('recipes_anonymous'):
+                client.force_authenticate(user)
+            with CaptureQueriesContext(connection) as context:
+                self.call(client, method, url, data)
+            queries = len(context)
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                self.call(client, method, url, data)
+                timings.append((time.perf_counter() - started) * 1000)
+            budget = BUDGETS[name]
+            line = (f'{name}: {queries}/{budget} запросов, '
+                    f'медиана {statistics.median(timings or [0]):.1f} мс')
+            if queries > budget:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        return failed
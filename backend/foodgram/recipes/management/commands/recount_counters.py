@@ -0,0 +1,18 @@
+from django.core.management import BaseCommand
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = "Пересчет счетчиков избранного, покупок, рецептов и подписчиков"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for model in COUNTERS:
+            fixed = recount(model, options['batch_size'])
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}'
+            )
+        self.stdout.write(self.style.SUCCESS("Счетчики пересчитаны!"))
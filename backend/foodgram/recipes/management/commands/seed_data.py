@@ -0,0 +1,179 @@
+import random
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+
+from PIL import Image
+
+from recipes.counters import COUNTERS, recount
+from recipes.images import generate_variants, get_storage
+from recipes.models import (Favorite, Ingredient, IngredientRecipe,
+                            ListShopping, Recipe, Subscribe, Tag)
+from users.models import User
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def placeholder_image():
+    # Одна картинка на все рецепты: хранилище адресует файлы
+    # по содержимому, поэтому на диске она окажется один раз.
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 800), '#E26C2D').save(buffer, 'PNG')
+    name = get_storage().save(
+        Recipe._meta.get_field('image').upload_to + 'seed.png',
+        ContentFile(buffer.getvalue()),
+    )
+    generate_variants(name)
+    return name
+
+
+class Command(BaseCommand):
+    help = "Генерация тестовых данных для нагрузочного тестирования"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Избранных рецептов и покупок на юзера')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок на юзера')
+        parser.add_argument('--ingredients',
+                            help='Файл для load_ingredients, '
+                                 'если ингредиентов в базе нет')
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--password', default='benchmark')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        if not Ingredient.objects.exists():
+            path = options['ingredients']
+            call_command('load_ingredients', *filter(None, [path]),
+                         stdout=self.stdout)
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredient_ids) < options['ingredients_per_recipe']:
+            raise CommandError('Недостаточно ингредиентов в базе.')
+        if not Tag.objects.exists():
+            for name, color, slug in TAGS:
+                Tag.objects.create(name=name, color=color, slug=slug)
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        image = placeholder_image()
+
+        with transaction.atomic():
+            prefix = options['prefix']
+            offset = User.objects.filter(username__startswith=prefix).count()
+            password = make_password(options['password'])
+            users = User.objects.bulk_create(
+                (
+                    User(
+                        username=f'{prefix}{i}',
+                        email=f'{prefix}{i}@example.com',
+                        first_name=prefix,
+                        last_name=str(i),
+                        password=password,
+                    )
+                    for i in range(offset, offset + options['users'])
+                ),
+                batch_size=batch_size,
+            )
+            user_ids = [user.pk for user in users]
+            self.stdout.write(f'Юзеров: {len(user_ids)}')
+
+            # Имена рецептов уникальны: повторный запуск продолжает нумерацию.
+            name = f'Рецепт {prefix}'
+            offset = Recipe.objects.filter(name__startswith=name).count()
+
+            recipes = Recipe.objects.bulk_create(
+                (
+                    Recipe(
+                        author_id=rng.choice(user_ids),
+                        name=f'{name}{i}',
+                        text=f'Описание рецепта {i}',
+                        cooking_time=rng.randint(1, 128),
+                        image=image,
+                        image_variants=True,
+                    )
+                    for i in range(offset, offset + options['recipes'])
+                ),
+                batch_size=batch_size,
+            )
+            recipe_ids = [recipe.pk for recipe in recipes]
+            self.stdout.write(f'Рецептов: {len(recipe_ids)}')
+
+            per_recipe = options['ingredients_per_recipe']
+            IngredientRecipe.objects.bulk_create(
+                (
+                    IngredientRecipe(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=rng.randint(1, 500),
+                    )
+                    for recipe_id in recipe_ids
+                    for ingredient_id in rng.sample(ingredient_ids,
+                                                    per_recipe)
+                ),
+                batch_size=batch_size,
+            )
+            Recipe.tags.through.objects.bulk_create(
+                (
+                    Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                    for recipe_id in recipe_ids
+                    for tag_id in rng.sample(
+                        tag_ids, rng.randint(1, len(tag_ids))
+                    )
+                ),
+                batch_size=batch_size,
+            )
+
+            favorites = min(options['favorites'], len(recipe_ids))
+            for model in (Favorite, ListShopping):
+                model.objects.bulk_create(
+                    (
+                        model(user_id=user_id, recipe_id=recipe_id)
+                        for user_id in user_ids
+                        for recipe_id in rng.sample(recipe_ids, favorites)
+                    ),
+                    batch_size=batch_size,
+                )
+            subscriptions = min(options['subscriptions'], len(user_ids) - 1)
+            Subscribe.objects.bulk_create(
+                (
+                    Subscribe(user_id=user_id, author_id=author_id)
+                    for user_id in user_ids
+                    for author_id in [
+                        pk for pk in rng.sample(user_ids, subscriptions + 1)
+                        if pk != user_id
+                    ][:subscriptions]
+                ),
+                batch_size=batch_size,
+            )
+
+            # bulk_create не вызывает сигналы: поисковый вектор
+            # и счетчики обновляются здесь.
+            for batch in batched(recipe_ids, batch_size):
+                Recipe.objects.filter(pk__in=batch).update_search_vector()
+            for model in COUNTERS:
+                recount(model, batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f"Данные созданы! Пароль юзеров {prefix}N: {options['password']}"
+        ))
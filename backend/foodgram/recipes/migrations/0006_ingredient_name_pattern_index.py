@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_auto_20230731_1358'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=(
+                'CREATE INDEX recipes_ingredient_name_upper_idx '
+                'ON recipes_ingredient (UPPER(name) text_pattern_ops);'
+            ),
+            reverse_sql='DROP INDEX recipes_ingredient_name_upper_idx;',
+        ),
+    ]
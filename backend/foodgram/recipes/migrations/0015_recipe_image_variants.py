@@ -0,0 +1,41 @@
+# Generated by Django 3.2.3 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+VARIANTS = ('subscription', 'card', 'detail')
+
+
+def mark_existing_variants(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    storage = Recipe._meta.get_field('image').storage
+    names = (
+        Recipe.objects.exclude(image='')
+        .order_by('image')
+        .values_list('image', flat=True)
+        .distinct()
+    )
+    ready = [
+        name for name in names
+        if all(
+            storage.exists(f'{name.rsplit(".", 1)[0]}.{variant}.webp')
+            for variant in VARIANTS
+        )
+    ]
+    Recipe.objects.filter(image__in=ready).update(image_variants=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0014_recipe_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.BooleanField(default=False, editable=False, verbose_name='WebP-варианты картинки готовы'),
+        ),
+        migrations.RunPython(mark_existing_variants,
+                             migrations.RunPython.noop),
+    ]
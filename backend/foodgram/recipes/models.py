@@ -7,16 +7,44 @@ from django.core.validators import (
 
 from django.db import models
 
+from django.db.models import (
+    BooleanField,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+    Window
+)
+
+from django.contrib.postgres.aggregates import StringAgg
+
+from django.contrib.postgres.indexes import GinIndex
+
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+
+from django.db.models.expressions import RawSQL
+
+from django.db.models.functions import RowNumber
+
+from django.utils import timezone
+
 from colorfield.fields import ColorField
 
 from colorfield.validators import color_hex_validator
 
 from django.forms import ValidationError
 
+from .page_cache import invalidate_recipe_pages
+
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 CHAR_MAX_L = 200
 SLUG_MAX_L = 60
+SEARCH_CONFIG = 'russian'
 
 
 class Tag(models.Model):
@@ -67,11 +95,88 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            ),
+        )
 
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        # Вектор нужен только для поиска, в ответы он не попадает.
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredientrecipe_set',
+                queryset=IngredientRecipe.objects.select_related('ingredient')
+            ),
+        )
+
+    def limit_per_author(self, limit):
+        # Django 3.2 не умеет фильтровать по оконной функции,
+        # поэтому ранжированный запрос оборачивается в подзапрос.
+        ranked = self.annotate(row_number=Window(
+            expression=RowNumber(),
+            partition_by=F('author_id'),
+            order_by=F('id').desc(),
+        )).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE "row_number" <= %s',
+            (*params, limit),
+        ))
+
+    def touch(self, **fields):
+        # Для изменений связанных строк в обход Recipe.save().
+        updated = self.update(updated_at=timezone.now(), **fields)
+        if updated:
+            invalidate_recipe_pages(self)
+        return updated
+
+    def update_search_vector(self):
+        ingredient_names = (
+            IngredientRecipe.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(names=StringAgg('ingredient__name', ' '))
+            .values('names')
+        )
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            + SearchVector(Subquery(ingredient_names), weight='C',
+                           config=SEARCH_CONFIG)
+        ))
+
+    def with_user_flags(self, user):
+        if user.is_anonymous:
+            false = Value(False, output_field=BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ListShopping.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            author_is_subscribed=Exists(
+                Subscribe.objects.filter(user=user,
+                                         author=OuterRef('author_id'))
+            ),
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -87,6 +192,7 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='recipes/img/',
+        storage=ContentAddressedStorage(),
     )
     text = models.TextField(verbose_name='Текстовое описание')
     tags = models.ManyToManyField(
@@ -110,14 +216,83 @@ class Recipe(models.Model):
         )
     )
 
+    image_variants = models.BooleanField(
+        'WebP-варианты картинки готовы',
+        default=False,
+        editable=False,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+    created_at = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        db_index=True,
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ("-id",)
+        indexes = (
+            GinIndex(fields=['search_vector'], name='recipe_search_idx'),
+        )
 
     def __str__(self):
         return self.name
 
+    # Эти поля меняются только UPDATE-запросами (recipes.counters,
+    # update_search_vector, generate_variants): сохранение загруженного
+    # ранее объекта не должно перезаписывать их устаревшими значениями.
+    MANAGED_FIELDS = ('favorites_count', 'in_carts_count', 'search_vector',
+                      'image_variants')
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            managed = set(self.MANAGED_FIELDS)
+            if self.image.name != getattr(self, '_loaded_image', None):
+                # Варианты новой картинки создаст generate_variants.
+                self.image_variants = False
+                managed.discard('image_variants')
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in managed
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        self._loaded_author = self.author_id
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in field_names:
+            instance._loaded_image = values[field_names.index('image')]
+        if 'author_id' in field_names:
+            instance._loaded_author = values[field_names.index('author_id')]
+        return instance
+
 
 class IngredientRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -145,6 +320,12 @@ class IngredientRecipe(models.Model):
     class Meta:
         verbose_name = 'Ингредиент для рецепта'
         verbose_name_plural = 'Ингредиенты для рецептов'
+        indexes = (
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='ingredient_recipe_idx',
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=['recipe', 'ingredient'],
@@ -211,6 +392,12 @@ class Favorite(AbsModel):
                 name='unique_favorite'
             ),
         )
+        indexes = (
+            models.Index(
+                fields=['user', 'recipe'],
+                name='favorite_user_recipe_idx',
+            ),
+        )
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
 
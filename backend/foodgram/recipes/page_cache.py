@@ -0,0 +1,41 @@
+from django.db import transaction
+
+from .versions import bump_version
+
+# Зависимости кешированных страниц списка рецептов;
+# версия PAGES меняет все страницы сразу.
+PAGES = 'recipe_pages'
+LIST = 'recipe_list'
+
+
+def tag_dependency(tag_id):
+    return f'recipe_list:tag:{tag_id}'
+
+
+def author_dependency(author_id):
+    return f'recipe_list:author:{author_id}'
+
+
+def invalidate_recipe_pages(recipes=None, author_ids=(), tag_ids=()):
+    # Версии меняются после коммита: иначе параллельный запрос
+    # успеет закешировать под новой версией старые данные.
+    # Авторы и теги recipes читаются в момент коммита.
+    author_ids, tag_ids = set(author_ids), set(tag_ids)
+
+    def invalidate():
+        if recipes is not None:
+            for author_id, tag_id in recipes.values_list('author_id',
+                                                         'tags'):
+                author_ids.add(author_id)
+                tag_ids.add(tag_id)
+        bump_version(LIST)
+        for author_id in author_ids:
+            bump_version(author_dependency(author_id))
+        for tag_id in tag_ids - {None}:
+            bump_version(tag_dependency(tag_id))
+
+    transaction.on_commit(invalidate)
+
+
+def invalidate_all_pages():
+    transaction.on_commit(lambda: bump_version(PAGES))
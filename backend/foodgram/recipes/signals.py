@@ -0,0 +1,152 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import User
+
+from .autocomplete import ingredient_index
+from .counters import counter_sources, decrement, increment
+from .images import schedule_variants
+from .models import (Favorite, Ingredient, IngredientRecipe, ListShopping,
+                     Recipe, Subscribe, Tag)
+from .page_cache import invalidate_recipe_pages
+from .versions import bump_version
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_reference_version(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_image(sender, instance, **kwargs):
+    name = instance.image.name
+    previous = getattr(instance, '_loaded_image', None)
+    instance._loaded_image = name
+    # Старые файлы без ссылок удаляет только collect_media: здесь
+    # не видно параллельной загрузки той же картинки до ее коммита.
+    if name and name != previous:
+        transaction.on_commit(lambda: schedule_variants(name))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, created, **kwargs):
+    # Новый рецепт еще без ингредиентов: вектор пересчитают
+    # RecipeWriteSerializer.create и RecipeAdmin.save_related.
+    if not created:
+        Recipe.objects.filter(pk=instance.pk).update_search_vector()
+
+
+# Удаление обрабатывается там, где удаляют: сигнал на каждую строку
+# превращал замену ингредиентов рецепта в N пересчетов вектора.
+@receiver(post_save, sender=IngredientRecipe)
+def update_search_vector_on_ingredients(sender, instance, **kwargs):
+    recipes = Recipe.objects.filter(pk=instance.recipe_id)
+    recipes.update_search_vector()
+    recipes.touch()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_search_vector_on_rename(sender, instance, created, **kwargs):
+    if not created:
+        Recipe.objects.filter(ingredients=instance).update_search_vector()
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_pages_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_loaded_author', None)
+    invalidate_recipe_pages(
+        Recipe.objects.filter(pk=instance.pk),
+        author_ids=filter(None, [previous, instance.author_id]),
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def invalidate_pages_on_delete(sender, instance, **kwargs):
+    # После удаления теги рецепта уже не прочитать.
+    invalidate_recipe_pages(
+        author_ids=[instance.author_id],
+        tag_ids=instance.tags.values_list('id', flat=True),
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_pages_on_tags(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        recipes = instance.recipe_set.all()
+        if pk_set is not None:
+            recipes = Recipe.objects.filter(pk__in=pk_set)
+        invalidate_recipe_pages(
+            author_ids=recipes.values_list('author_id', flat=True),
+            tag_ids=[instance.pk],
+        )
+        return
+    invalidate_recipe_pages(
+        Recipe.objects.filter(pk=instance.pk),
+        tag_ids=(instance.tags.values_list('id', flat=True)
+                 if pk_set is None else pk_set),
+    )
+
+
+# Объекты со счетчиками, которые сейчас удаляются: каскадно удаляемые
+# вместе с ними строки не уменьшают их счетчики запросом на строку.
+deleting = threading.local()
+
+
+def deleting_objects():
+    if not hasattr(deleting, 'objects'):
+        deleting.objects = set()
+    return deleting.objects
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=User)
+def mark_deleting(sender, instance, **kwargs):
+    deleting_objects().add((sender, instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=User)
+def unmark_deleting(sender, instance, **kwargs):
+    deleting_objects().discard((sender, instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ListShopping)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Subscribe)
+def increment_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    for target, field, key in counter_sources(sender):
+        pk = getattr(instance, f'{key}_id')
+        # Рецепт может сменить автора в админке.
+        previous = (getattr(instance, f'_loaded_{key}', pk)
+                    if not created else None)
+        if previous != pk:
+            increment(target, pk, field)
+            if previous is not None:
+                decrement(target, previous, field)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ListShopping)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Subscribe)
+def decrement_counters(sender, instance, **kwargs):
+    for target, field, key in counter_sources(sender):
+        pk = getattr(instance, f'{key}_id')
+        if (target, pk) not in deleting_objects():
+            decrement(target, pk, field)
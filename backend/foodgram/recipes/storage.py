@@ -0,0 +1,53 @@
+import os
+import re
+from hashlib import sha256
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+CONTENT_NAME = re.compile(r'^[0-9a-f]{64}(\.|$)')
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_NAME.match(os.path.basename(name)))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    # Файл называется SHA-256 своего содержимого: одинаковые загрузки
+    # хранятся один раз, а URL никогда не меняет содержимое.
+    # Производные файлы (например, WebP-варианты), чье имя уже
+    # начинается с хеша, сохраняются под своим именем.
+    def content_name(self, name, content):
+        digest = sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if not is_content_addressed(name):
+            name = self.content_name(name, content)
+        if self.exists(name):
+            # Повторная загрузка освежает файл: collect_media --min-age
+            # не удалит его, пока ссылка еще в незакоммиченной транзакции.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def walk(self, path):
+        try:
+            directories, files = self.listdir(path)
+        except FileNotFoundError:
+            return
+        for file in files:
+            yield os.path.join(path, file)
+        for directory in directories:
+            yield from self.walk(os.path.join(path, directory))
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Tag
+from .versions import get_version
+
+
+def get_tag_map():
+    # Слаг -> id; ключ содержит версию тегов, поэтому после
+    # изменения тега карта перечитывается из базы.
+    key = f'tag_map:{get_version(Tag)}'
+    tag_map = cache.get(key)
+    if tag_map is None:
+        tag_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(key, tag_map, settings.RESPONSE_CACHE_TIMEOUT)
+    return tag_map
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_map()]
@@ -0,0 +1,38 @@
+import time
+
+from django.core.cache import cache
+
+
+def _key(model):
+    # Кроме модели версией может быть помечена любая строка-зависимость.
+    if isinstance(model, str):
+        return f'version:{model}'
+    return f'version:{model._meta.label_lower}'
+
+
+def get_version(model):
+    # Начальное значение — метка времени: если ключ вытеснят из кеша,
+    # новая версия не совпадет ни с одной из прежних.
+    key = _key(model)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(model):
+    try:
+        cache.incr(_key(model))
+    except ValueError:
+        get_version(model)
+
+
+def get_versions(models):
+    # Версии нескольких зависимостей за одно обращение к кешу.
+    keys = {_key(model): model for model in models}
+    versions = cache.get_many(keys)
+    return [
+        versions[key] if key in versions else get_version(model)
+        for key, model in keys.items()
+    ]
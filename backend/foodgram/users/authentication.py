@@ -0,0 +1,71 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+class TokenCache:
+    # При TOKEN_CACHE_SHARED записи живут только в общем кеше Django:
+    # сброс сигналами при удалении токена и сохранении юзера сразу
+    # виден всем воркерам. Иначе — LRU в памяти процесса с TTL.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def shared_key(self, key):
+        return f'auth_token:{sha256(key.encode()).hexdigest()}'
+
+    def store(self, key, user):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.TOKEN_CACHE_TTL,
+                                 user)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def get(self, key):
+        if settings.TOKEN_CACHE_SHARED:
+            return cache.get(self.shared_key(key))
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, user = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    return copy.copy(user)
+                del self.entries[key]
+        return None
+
+    def set(self, key, user):
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(self.shared_key(key), user, settings.TOKEN_CACHE_TTL)
+        else:
+            self.store(key, user)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete(self.shared_key(key))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, copy.copy(user))
+            return user, token
+        return user, self.get_model()(key=key, user=user)
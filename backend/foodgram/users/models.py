@@ -9,6 +9,16 @@ class User(AbstractUser):
         max_length=254,
         unique=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -18,3 +28,19 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.username
+
+    # Счетчики меняются только через F() в recipes.counters; юзер
+    # из кеша токенов может быть старше строки в БД.
+    MANAGED_FIELDS = ('recipes_count', 'followers_count')
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.MANAGED_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,36 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.page_cache import invalidate_all_pages
+
+from .authentication import token_cache
+from .models import User
+
+
+@receiver((post_save, post_delete), sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_token(sender, instance, update_fields=None, **kwargs):
+    # Вход обновляет только last_login: на аутентификацию это не влияет.
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    key = Token.objects.filter(user_id=instance.pk).values_list(
+        'key', flat=True
+    ).first()
+    if key:
+        token_cache.invalidate(key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, update_fields=None,
+                            **kwargs):
+    # Данные автора есть в каждой карточке его рецептов.
+    if created or not instance.recipes_count:
+        return
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    invalidate_all_pages()
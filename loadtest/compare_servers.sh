@@ -0,0 +1,28 @@
+#!/bin/sh
+# Пропускная способность в режимах sync и thread при одинаковой
+# нагрузке. Запускается из корня репозитория при работающей БД
+# и данных из seed_data:
+#   USERS=100 DURATION=1m sh loadtest/compare_servers.sh
+set -e
+
+USERS=${USERS:-100}
+SPAWN_RATE=${SPAWN_RATE:-20}
+DURATION=${DURATION:-1m}
+BIND=${BIND:-127.0.0.1:8001}
+RESULTS=${RESULTS:-loadtest/results}
+
+mkdir -p "$RESULTS"
+for mode in sync thread; do
+    (cd backend/foodgram &&
+        SERVER_MODE=$mode GUNICORN_BIND=$BIND \
+        exec gunicorn --config gunicorn.conf.py) &
+    server=$!
+    sleep 3
+    locust -f loadtest/locustfile.py --headless --only-summary \
+        --host "http://$BIND" -u "$USERS" -r "$SPAWN_RATE" -t "$DURATION" \
+        --csv "$RESULTS/$mode" > /dev/null 2>&1 || true
+    kill $server
+    wait $server || true
+    echo "$mode: $(grep Aggregated "$RESULTS/${mode}_stats.csv" |
+        awk -F, '{printf "%s запросов, %s ошибок, медиана %s мс, %.1f rps", $3, $4, $5, $10}')"
+done
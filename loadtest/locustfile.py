@@ -0,0 +1,125 @@
+# Сценарий повторяет запросы фронтенда (frontend/src/api/index.js).
+# Юзеры создаются командой seed_data:
+#   python manage.py seed_data --users 200 --recipes 5000
+#   locust -f loadtest/locustfile.py --host http://127.0.0.1
+import os
+import random
+
+from locust import HttpUser, between, task
+
+PREFIX = os.getenv('SEED_PREFIX', 'bench')
+PASSWORD = os.getenv('SEED_PASSWORD', 'benchmark')
+USERS = int(os.getenv('SEED_USERS', 100))
+TAGS = ('breakfast', 'lunch', 'dinner')
+SEARCH = ('а', 'мо', 'сол', 'кар', 'пер', 'мук')
+
+
+def tags_query():
+    tags = random.sample(TAGS, random.randint(1, len(TAGS)))
+    return ''.join(f'&tags={tag}' for tag in tags)
+
+
+class AnonymousVisitor(HttpUser):
+    weight = 3
+    wait_time = between(1, 5)
+
+    @task(10)
+    def recipes(self):
+        page = random.randint(1, 5)
+        self.client.get(
+            f'/api/recipes/?page={page}&limit=6{tags_query()}',
+            name='/api/recipes/',
+        )
+
+    @task(3)
+    def recipe(self):
+        self.client.get(
+            f'/api/recipes/{random.randint(1, 1000)}/',
+            name='/api/recipes/[id]/',
+        )
+
+    @task(2)
+    def tags(self):
+        self.client.get('/api/tags/')
+
+
+class AuthorizedUser(HttpUser):
+    weight = 1
+    wait_time = between(1, 5)
+
+    def on_start(self):
+        number = random.randrange(USERS)
+        response = self.client.post('/api/auth/token/login/', json={
+            'email': f'{PREFIX}{number}@example.com',
+            'password': PASSWORD,
+        })
+        token = response.json()['auth_token']
+        self.client.headers['Authorization'] = f'Token {token}'
+        self.recipes_seen = []
+
+    @task(10)
+    def recipes(self):
+        page = random.randint(1, 5)
+        response = self.client.get(
+            f'/api/recipes/?page={page}&limit=6{tags_query()}',
+            name='/api/recipes/',
+        )
+        if response.ok:
+            self.recipes_seen = [
+                recipe['id'] for recipe in response.json()['results']
+            ]
+
+    @task(2)
+    def favorites(self):
+        self.client.get(
+            f'/api/recipes/?page=1&limit=6&is_favorited=1{tags_query()}',
+            name='/api/recipes/?is_favorited=1',
+        )
+
+    @task(3)
+    def recipe(self):
+        if self.recipes_seen:
+            self.client.get(
+                f'/api/recipes/{random.choice(self.recipes_seen)}/',
+                name='/api/recipes/[id]/',
+            )
+
+    @task(2)
+    def subscriptions(self):
+        self.client.get(
+            '/api/users/subscriptions/?page=1&limit=6&recipes_limit=3',
+            name='/api/users/subscriptions/',
+        )
+
+    @task(2)
+    def toggle_favorite(self):
+        if not self.recipes_seen:
+            return
+        url = f'/api/recipes/{random.choice(self.recipes_seen)}/favorite/'
+        with self.client.post(url, name='/api/recipes/[id]/favorite/',
+                              catch_response=True) as response:
+            if response.status_code == 400:
+                response.success()
+        self.client.delete(url, name='/api/recipes/[id]/favorite/')
+
+    @task(2)
+    def shopping_cart(self):
+        if not self.recipes_seen:
+            return
+        url = (f'/api/recipes/{random.choice(self.recipes_seen)}'
+               '/shopping_cart/')
+        with self.client.post(url, name='/api/recipes/[id]/shopping_cart/',
+                              catch_response=True) as response:
+            if response.status_code == 400:
+                response.success()
+
+    @task(3)
+    def ingredients(self):
+        self.client.get(
+            f'/api/ingredients/?name={random.choice(SEARCH)}',
+            name='/api/ingredients/?name=',
+        )
+
+    @task(1)
+    def download_shopping_cart(self):
+        self.client.get('/api/recipes/download_shopping_cart/')
@@ -0,0 +1,16 @@
+#!/bin/sh
+set -e
+# При первом запуске копирует основную БД (db) и запускается
+# в режиме standby: pg_basebackup -R пишет standby.signal.
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    mkdir -p "$PGDATA"
+    chown postgres "$PGDATA"
+    chmod 700 "$PGDATA"
+    until gosu postgres env PGPASSWORD="$POSTGRES_PASSWORD" \
+            pg_basebackup -h db -U "$POSTGRES_USER" -D "$PGDATA" -R -X stream
+    do
+        rm -rf "${PGDATA:?}"/*
+        sleep 2
+    done
+fi
+exec docker-entrypoint.sh postgres
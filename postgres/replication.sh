@@ -0,0 +1,3 @@
+#!/bin/sh
+# Разрешает потоковую репликацию для сервиса replica из docker-compose.yml.
+echo "host replication all all md5" >> "$PGDATA/pg_hba.conf"